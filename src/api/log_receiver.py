@@ -1,20 +1,91 @@
 """
 HTTP API для приема логов от AdminLogCore плагина Rust сервера
 """
+import asyncio
+import functools
+import hmac
 import json
 import logging
-from typing import Optional
+from typing import List, Optional
 from aiohttp import web
 from datetime import datetime
 import discord
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:  # orjson необязателен, используем стандартный json
+    _json_loads = json.loads
+    
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
 logger = logging.getLogger(__name__)
 
+# Discord принимает не более 10 embed в одном сообщении
+# и не более 6000 символов во всех embed сообщения вместе
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+# Сколько ждать накопления пачки логов перед отправкой (в секундах)
+LOG_BATCH_DELAY = 0.5
+# Ограничение очереди, чтобы при недоступности Discord не копить логи бесконечно
+LOG_QUEUE_MAXSIZE = 1000
+
+# Цвет embed в зависимости от категории лога
+_COLOR_MAP = {
+    'INFO': 0x3498db,      # Синий
+    'WARN': 0xf39c12,      # Оранжевый
+    'ADMIN': 0x2ecc71,     # Зеленый
+    'DANGER': 0xe74c3c,    # Красный
+    'DEBUG': 0x95a5a6,     # Серый
+}
+_DEFAULT_COLOR = _COLOR_MAP['INFO']
+
+# Уровни категорий для фильтрации отправки в Discord
+# (неизвестные категории считаются INFO, как и при выборе цвета)
+_CATEGORY_LEVELS = {
+    'DEBUG': 0,
+    'INFO': 1,
+    'WARN': 2,
+    'ADMIN': 2,
+    'DANGER': 3,
+}
+_DEFAULT_CATEGORY_LEVEL = _CATEGORY_LEVELS['INFO']
+
+# Ответы health check заранее сериализованы: меняется только флаг готовности бота
+_HEALTH_BODY = {
+    ready: _json_dumps({
+        "status": "ok",
+        "service": "AdminLogCore Log Receiver",
+        "bot_ready": ready
+    })
+    for ready in (True, False)
+}
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_timestamp(timestamp: str) -> Optional[int]:
+    """
+    Перевести ISO timestamp в Unix-время (None, если формат не распознан)
+    Результат кэшируется: логи одной пачки часто приходят с одинаковым временем
+    """
+    try:
+        # fromisoformat до Python 3.11 не понимает суффикс Z
+        return int(datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp())
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def _json_response(data, status: int = 200) -> web.Response:
+    """Сформировать JSON ответ (аналог web.json_response на быстром сериализаторе)"""
+    return web.Response(body=_json_dumps(data), status=status, content_type='application/json')
+
 
 class LogReceiver:
     """HTTP сервер для приема логов от AdminLogCore"""
     
-    def __init__(self, bot, auth_token: str, log_channel_id: Optional[int] = None):
+    def __init__(self, bot, auth_token: str, log_channel_id: Optional[int] = None, min_category: str = 'DEBUG'):
         """
         Инициализация приемника логов
         
@@ -22,10 +93,20 @@ class LogReceiver:
             bot: Экземпляр Discord бота
             auth_token: Токен авторизации (должен совпадать с AuthToken в AdminLogCore)
             log_channel_id: ID канала Discord для отправки логов (опционально)
+            min_category: Минимальная категория лога для отправки в Discord
         """
         self.bot = bot
         self.auth_token = auth_token
+        # Байтовая форма токена для сравнения за постоянное время
+        self._auth_token_bytes = auth_token.encode('utf-8')
         self.log_channel_id = log_channel_id
+        self._min_category_level = _CATEGORY_LEVELS.get(min_category.upper(), _DEFAULT_CATEGORY_LEVEL)
+        # Канал логов кэшируется после первого поиска
+        self._channel: Optional[discord.abc.Messageable] = None
+        # Embed логов для Discord копятся в очереди и отправляются пачками
+        # (None в очереди - сигнал завершения для фоновой задачи)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=LOG_QUEUE_MAXSIZE)
+        self._flush_task: Optional[asyncio.Task] = None
         self.app = web.Application()
         self.runner: Optional[web.AppRunner] = None
         self.site: Optional[web.TCPSite] = None
@@ -36,6 +117,12 @@ class LogReceiver:
         
         logger.info("LogReceiver инициализирован")
     
+    def _get_channel(self) -> Optional[discord.abc.Messageable]:
+        """Получить канал логов из кэша бота (без перебора серверов)"""
+        if self._channel is None and self.log_channel_id:
+            self._channel = self.bot.get_channel(self.log_channel_id)
+        return self._channel
+    
     async def handle_log(self, request: web.Request) -> web.Response:
         """
         Обработка POST запроса с логом от AdminLogCore
@@ -54,20 +141,20 @@ class LogReceiver:
         """
         try:
             # Проверка авторизации
-            auth_header = request.headers.get('Auth')
-            if auth_header != self.auth_token:
+            auth_header = request.headers.get('Auth', '').encode('utf-8')
+            if not hmac.compare_digest(auth_header, self._auth_token_bytes):
                 logger.warning(f"Неавторизованный запрос от {request.remote}")
-                return web.json_response(
+                return _json_response(
                     {"error": "Unauthorized"},
                     status=401
                 )
             
             # Получение JSON данных
             try:
-                data = await request.json()
-            except json.JSONDecodeError as e:
+                data = _json_loads(await request.read())
+            except ValueError as e:  # JSONDecodeError обеих библиотек и ошибки кодировки
                 logger.error(f"Ошибка парсинга JSON: {e}")
-                return web.json_response(
+                return _json_response(
                     {"error": "Invalid JSON"},
                     status=400
                 )
@@ -77,7 +164,7 @@ class LogReceiver:
             missing_fields = [field for field in required_fields if field not in data]
             if missing_fields:
                 logger.error(f"Отсутствуют обязательные поля: {missing_fields}")
-                return web.json_response(
+                return _json_response(
                     {"error": f"Missing required fields: {', '.join(missing_fields)}"},
                     status=400
                 )
@@ -89,27 +176,43 @@ class LogReceiver:
             timestamp = data.get('timestamp', '')
             
             # Логирование в консоль
-            logger.info(f"[{category}] {source}: {message}")
+            logger.info("[%s] %s: %s", category, source, message)
             
-            # Отправка в Discord канал (если настроен)
-            if self.log_channel_id:
-                await self.send_to_discord(source, category, message, timestamp)
+            # Постановка в очередь на отправку в Discord канал (если настроен);
+            # пока бот не готов, лог все равно не будет отправлен - не ставим его в очередь
+            if self.log_channel_id and self._should_send(category):
+                if not self.bot or not self.bot.is_ready():
+                    logger.warning("Бот не готов, пропускаем отправку в Discord")
+                else:
+                    # Embed собирается сразу: ошибка в данных одного лога
+                    # не должна прерывать фоновую отправку остальных
+                    try:
+                        self._queue.put_nowait(self._build_embed(source, category, message, timestamp))
+                    except asyncio.QueueFull:
+                        logger.warning("Очередь логов для Discord переполнена, лог пропущен")
             
-            return web.json_response(
+            return _json_response(
                 {"status": "ok", "received": True},
                 status=200
             )
             
         except Exception as e:
             logger.error(f"Ошибка обработки лога: {e}", exc_info=True)
-            return web.json_response(
+            return _json_response(
                 {"error": "Internal server error"},
                 status=500
             )
     
-    async def send_to_discord(self, source: str, category: str, message: str, timestamp: str):
+    def _should_send(self, category) -> bool:
+        """Проверить, проходит ли категория лога порог отправки в Discord"""
+        if not self._min_category_level:
+            return True
+        level = _CATEGORY_LEVELS.get(str(category).upper(), _DEFAULT_CATEGORY_LEVEL)
+        return level >= self._min_category_level
+    
+    def _build_embed(self, source: str, category: str, message: str, timestamp: str) -> discord.Embed:
         """
-        Отправка лога в Discord канал
+        Создание embed для лога
         
         Args:
             source: Источник лога (название плагина)
@@ -117,71 +220,115 @@ class LogReceiver:
             message: Текст сообщения
             timestamp: Временная метка события
         """
+        # Значения приходят из JSON как есть - категория может быть не строкой
+        category = str(category)
+        color = _COLOR_MAP.get(category.upper(), _DEFAULT_COLOR)
+        
+        # Создание embed
+        embed = discord.Embed(
+            title=f"[{category}] {source}",
+            description=message,
+            color=color
+        )
+        
+        # Добавление временной метки события (если есть)
+        if timestamp:
+            # Парсим timestamp из формата ISO
+            event_time = _parse_timestamp(timestamp) if isinstance(timestamp, str) else None
+            if event_time is not None:
+                embed.add_field(
+                    name="Время события",
+                    value=f"<t:{event_time}:F>",
+                    inline=False
+                )
+            else:
+                # Если не удалось распарсить, просто добавляем как текст
+                embed.add_field(
+                    name="Время события",
+                    value=timestamp,
+                    inline=False
+                )
+        
+        return embed
+    
+    async def send_to_discord(self, embeds: List[discord.Embed]):
+        """
+        Отправка пачки логов в Discord канал одним сообщением
+        
+        Если Discord отклонил пачку, логи отправляются по одному,
+        чтобы ошибка в одном из них не теряла остальные.
+        
+        Args:
+            embeds: Embed логов, не более MAX_EMBEDS_PER_MESSAGE штук
+                    и MAX_EMBED_CHARS_PER_MESSAGE символов вместе
+        """
         try:
             if not self.bot or not self.bot.is_ready():
                 logger.warning("Бот не готов, пропускаем отправку в Discord")
                 return
             
-            # Поиск канала
-            channel = None
-            for guild in self.bot.guilds:
-                channel = guild.get_channel(self.log_channel_id)
-                if channel:
-                    break
-            
+            channel = self._get_channel()
             if not channel:
                 logger.warning(f"Канал с ID {self.log_channel_id} не найден")
                 return
             
-            # Определение цвета embed в зависимости от категории
-            color_map = {
-                'INFO': 0x3498db,      # Синий
-                'WARN': 0xf39c12,      # Оранжевый
-                'ADMIN': 0x2ecc71,     # Зеленый
-                'DANGER': 0xe74c3c,    # Красный
-                'DEBUG': 0x95a5a6,     # Серый
-            }
-            color = color_map.get(category.upper(), 0x3498db)
+            # Отправка в канал
+            await channel.send(embeds=embeds)
+            logger.debug("Логи (%d) отправлены в Discord канал %s", len(embeds), self.log_channel_id)
             
-            # Создание embed
-            embed = discord.Embed(
-                title=f"[{category}] {source}",
-                description=message,
-                color=color
-            )
+        except discord.NotFound as e:
+            # Канал удален - сбрасываем кэш, чтобы найти его заново
+            self._channel = None
+            logger.error(f"Ошибка отправки лога в Discord: {e}")
+        except Exception as e:
+            if len(embeds) == 1:
+                logger.error(f"Ошибка отправки лога в Discord: {e}", exc_info=True)
+                return
+            logger.warning(f"Не удалось отправить пачку из {len(embeds)} логов ({e}), отправляем по одному")
+            for embed in embeds:
+                await self.send_to_discord([embed])
+    
+    async def _flush_loop(self):
+        """
+        Фоновая отправка логов из очереди пачками до MAX_EMBEDS_PER_MESSAGE штук
+        и MAX_EMBED_CHARS_PER_MESSAGE символов; лог, не поместившийся в пачку,
+        начинает следующую
+        """
+        carry: Optional[discord.Embed] = None
+        while True:
+            if carry is None:
+                embed = await self._queue.get()
+                if embed is None:
+                    return
+            else:
+                embed, carry = carry, None
             
-            # Добавление временной метки события (если есть)
-            if timestamp:
-                try:
-                    # Парсим timestamp из формата ISO
-                    event_time = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                    embed.add_field(
-                        name="Время события",
-                        value=f"<t:{int(event_time.timestamp())}:F>",
-                        inline=False
-                    )
-                except Exception:
-                    # Если не удалось распарсить, просто добавляем как текст
-                    embed.add_field(
-                        name="Время события",
-                        value=timestamp,
-                        inline=False
-                    )
+            # Даем накопиться пачке, если логов в очереди пока мало
+            if self._queue.qsize() < MAX_EMBEDS_PER_MESSAGE - 1:
+                await asyncio.sleep(LOG_BATCH_DELAY)
             
-            # Отправка в канал
-            await channel.send(embed=embed)
-            logger.debug(f"Лог отправлен в Discord канал {self.log_channel_id}")
+            batch = [embed]
+            batch_chars = len(embed)
+            stopping = False
+            while len(batch) < MAX_EMBEDS_PER_MESSAGE and not self._queue.empty():
+                embed = self._queue.get_nowait()
+                if embed is None:
+                    stopping = True
+                    break
+                if batch_chars + len(embed) > MAX_EMBED_CHARS_PER_MESSAGE:
+                    carry = embed
+                    break
+                batch.append(embed)
+                batch_chars += len(embed)
             
-        except Exception as e:
-            logger.error(f"Ошибка отправки лога в Discord: {e}", exc_info=True)
+            await self.send_to_discord(batch)
+            if stopping:
+                return
     
     async def handle_health(self, request: web.Request) -> web.Response:
         """Health check endpoint"""
-        return web.json_response({
-            "status": "ok",
-            "service": "AdminLogCore Log Receiver",
-            "bot_ready": self.bot.is_ready() if self.bot else False
-        })
+        bot_ready = bool(self.bot and self.bot.is_ready())
+        return web.Response(body=_HEALTH_BODY[bot_ready], content_type='application/json')
     
     async def start(self, host: str = '127.0.0.1', port: int = 5000):
         """
@@ -196,6 +343,11 @@ class LogReceiver:
             await self.runner.setup()
             self.site = web.TCPSite(self.runner, host, port)
             await self.site.start()
+            if self.log_channel_id:
+                self._flush_task = asyncio.create_task(self._flush_loop())
+            # Бот к этому моменту уже готов - находим канал заранее
+            if self.log_channel_id and self.bot and self.bot.is_ready():
+                self._get_channel()
             logger.info(f"✓ HTTP сервер запущен на {host}:{port}")
             logger.info(f"  Endpoint: http://{host}:{port}/log")
         except Exception as e:
@@ -209,6 +361,14 @@ class LogReceiver:
                 await self.site.stop()
             if self.runner:
                 await self.runner.cleanup()
+            # Отправляем логи, оставшиеся в очереди, и останавливаем фоновую задачу
+            if self._flush_task:
+                await self._queue.put(None)
+                try:
+                    await asyncio.wait_for(self._flush_task, timeout=10)
+                except asyncio.TimeoutError:
+                    logger.warning("Не удалось отправить оставшиеся логи в Discord")
+                self._flush_task = None
             logger.info("HTTP сервер остановлен")
         except Exception as e:
             logger.error(f"Ошибка остановки HTTP сервера: {e}", exc_info=True)
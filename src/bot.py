@@ -1,38 +1,51 @@
 """
 Главный файл Discord-бота для управления администрированием RUST-сервера
 """
+from __future__ import annotations
+
 import asyncio
+import atexit
+import contextlib
 import logging
+import logging.handlers
+import mmap
 import os
+import queue
+import re
 import sys
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
 # Добавляем корневую директорию проекта в PYTHONPATH
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-import discord
-from discord.ext import commands
-
 from config.config import (
     DISCORD_TOKEN,
     LOG_FILE,
     LOG_LEVEL,
     CHANNELS,
     DB_URL,
+    DB_POOL_MINSIZE,
+    DB_POOL_MAXSIZE,
+    DB_POOL_RECYCLE,
     BOT_ACTIVITY_NAME,
     BOT_ACTIVITY_TYPE,
     CONSOLE_LOGS_ENABLED,
     CONSOLE_LOGS_FILTERS,
     ADMIN_LOG_API
 )
-from src.database.models import Database
-from src.rcon.rcon_manager import RCONManager
-from src.commands import setup_admin, setup_privilege, setup_warn, setup_tickets
-from src.tasks.scheduler import PrivilegeScheduler
-from src.utils.admin_list_manager import AdminListManager
-from src.api.log_receiver import LogReceiver
+
+# discord.py и модули бота импортируются лениво в _build_bot(), чтобы
+# при ошибке конфигурации не тратить время на их загрузку
+if TYPE_CHECKING:
+    import discord
+    from discord.ext import commands
+    from src.database.models import Database
+    from src.rcon.rcon_manager import RCONManager
+    from src.tasks.scheduler import PrivilegeScheduler
+    from src.utils.admin_list_manager import AdminListManager
+    from src.api.log_receiver import LogReceiver
 
 # Настройка логирования
 log_file_path = LOG_FILE or 'logs/bot.log'
@@ -41,214 +54,276 @@ log_level_str = LOG_LEVEL or 'INFO'
 log_dir = Path(log_file_path).parent
 log_dir.mkdir(parents=True, exist_ok=True)
 
+# Запись логов в файл и консоль выполняется в отдельном потоке QueueListener,
+# чтобы медленный диск не блокировал цикл событий; сами вызовы логгера
+# только форматируют запись и кладут ее в очередь
+log_queue: queue.SimpleQueue = queue.SimpleQueue()
 logging.basicConfig(
     level=getattr(logging, log_level_str.upper(), logging.INFO),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file_path, encoding='utf-8'),
-        logging.StreamHandler()
-    ]
+    handlers=[logging.handlers.QueueHandler(log_queue)]
 )
+# Бот работает в одном процессе и одном цикле событий - сведения о потоках
+# и процессах в формате не используются, не собираем их для каждой записи
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+log_listener = logging.handlers.QueueListener(
+    log_queue,
+    logging.FileHandler(log_file_path, encoding='utf-8'),
+    logging.StreamHandler()
+)
+log_listener.start()
+log_listener_running = True
+
+
+def _stop_log_listener():
+    """Дописать оставшиеся в очереди записи и остановить поток логирования"""
+    global log_listener_running
+    if log_listener_running:
+        log_listener_running = False
+        log_listener.stop()
+
+
+# Если cleanup() не был вызван (например, при ошибке конфигурации),
+# поток логирования останавливается при выходе из процесса
+atexit.register(_stop_log_listener)
 
 logger = logging.getLogger(__name__)
 # Уменьшаем уровень логирования для discord библиотеки
 logging.getLogger('discord').setLevel(logging.INFO)
 logging.getLogger('websockets').setLevel(logging.INFO)
 
-# Создание бота с необходимыми intents
-intents = discord.Intents.default()
-intents.message_content = True
-intents.members = True
-intents.guilds = True
-
-bot = commands.Bot(command_prefix='!', intents=intents)
-
 # Глобальные объекты
+bot: Optional[commands.Bot] = None
 db: Optional[Database] = None
 rcon_manager: Optional[RCONManager] = None
 scheduler: Optional[PrivilegeScheduler] = None
 admin_list_manager: Optional[AdminListManager] = None
 log_receiver: Optional[LogReceiver] = None
 startup_message_sent = False  # Флаг для отслеживания отправки сообщения о запуске
+# on_ready вызывается при каждом переподключении к Discord, а инициализация нужна один раз
+initialized = False
+
+# ID каналов Discord из конфигурации (0 - канал не настроен)
+ADMIN_LOG_CHANNEL_ID = CHANNELS.get('ADMIN_LOGS')
+CONSOLE_LOG_CHANNEL_ID = CHANNELS.get('CONSOLE_LOGS')
+
+# Схема базы данных
+SCHEMA_FILE = project_root / "database" / "schema.sql"
+
+# Список обязательных таблиц из schema.sql
+REQUIRED_TABLES = (
+    'users',
+    'privileges',
+    'warnings',
+    'role_mappings',
+    'admin_list_messages',
+    'ticket_panels',
+    'tickets'
+)
+
+# Разбор schema.sql: команды CREATE TABLE / CREATE INDEX до ';' в байтах файла.
+# Комментарии (от -- до конца строки) разбираются как отдельные токены, чтобы
+# ';' или CREATE внутри комментария не считались частью схемы
+_SCHEMA_TOKEN_RE = re.compile(
+    rb'--[^\r\n]*|\bCREATE\s+(TABLE|INDEX)\b(?:--[^\r\n]*|[^;-]|-(?!-))*',
+    re.IGNORECASE
+)
+_SQL_COMMENT_RE = re.compile(r'--[^\r\n]*')
+
+# Коды ошибок MySQL/MariaDB при применении схемы: объект уже существует
+# (ER_TABLE_EXISTS_ERROR, ER_DUP_KEYNAME) и таблица не найдена (ER_NO_SUCH_TABLE)
+_SCHEMA_EXISTS_ERRNOS = frozenset({1050, 1061})
+_NO_SUCH_TABLE_ERRNO = 1146
+
+
+def _parse_schema(schema_sql: bytes) -> Tuple[List[str], List[str]]:
+    """
+    Разобрать схему на команды CREATE TABLE и CREATE INDEX
+    Принимает байты (в том числе mmap) и декодирует только найденные команды
+    """
+    create_table_commands = []
+    create_index_commands = []
+    for match in _SCHEMA_TOKEN_RE.finditer(schema_sql):
+        kind = match.group(1)
+        if kind is None:
+            continue  # Комментарий вне команды
+        
+        # Убираем комментарии внутри команды
+        command = _SQL_COMMENT_RE.sub('', match.group(0).decode('utf-8')).strip()
+        if kind.upper() == b'TABLE':
+            create_table_commands.append(command)
+        else:
+            create_index_commands.append(command)
+    
+    logger.debug(
+        "Найдено %d команд SQL: %d таблиц, %d индексов",
+        len(create_table_commands) + len(create_index_commands),
+        len(create_table_commands),
+        len(create_index_commands)
+    )
+    return create_table_commands, create_index_commands
+
+
+def _parse_schema_file(schema_file: Path) -> Tuple[List[str], List[str]]:
+    """Разобрать schema.sql прямо из отображенного в память файла, без чтения его целиком в строку"""
+    with open(schema_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return [], []  # mmap не умеет отображать пустой файл
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _parse_schema(mm)
+
+
+def _mysql_errno(error: Exception) -> Optional[int]:
+    """Код ошибки MySQL из исключения pymysql/aiomysql (None, если его нет)"""
+    args = getattr(error, 'args', ())
+    return args[0] if args and isinstance(args[0], int) else None
+
+
+async def _find_missing_tables(cursor) -> List[str]:
+    """
+    Вернуть обязательные таблицы, которых нет в базе данных
+    SHOW TABLES читает только текущую БД соединения, без обхода information_schema
+    """
+    await cursor.execute("SHOW TABLES")
+    existing_tables = {row[0] for row in await cursor.fetchall()}
+    return [table_name for table_name in REQUIRED_TABLES if table_name not in existing_tables]
+
+
+async def _ensure_schema(db: Database):
+    """
+    Проверить наличие обязательных таблиц и при необходимости применить schema.sql
+    Файл схемы не открывается, если все таблицы уже существуют
+    """
+    logger.info("Проверка схемы базы данных...")
+    async with db.pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            missing_tables = await _find_missing_tables(cursor)
+            if not missing_tables:
+                logger.info("Все таблицы базы данных существуют")
+                return
+            
+            logger.warning(f"⚠️ Найдены отсутствующие таблицы: {', '.join(missing_tables)}")
+            logger.info("Применение схемы базы данных автоматически...")
+            
+            if not SCHEMA_FILE.exists():
+                logger.error(f"Файл схемы не найден: {SCHEMA_FILE}")
+                logger.warning("Примените схему вручную через MySQL:")
+                logger.warning(f"  mysql -u {db.config['user']} -p {db.config['db']} < database/schema.sql")
+                return
+            
+            create_table_commands, create_index_commands = _parse_schema_file(SCHEMA_FILE)
+            
+            # Сначала создаем таблицы: все CREATE TABLE IF NOT EXISTS
+            # отправляются одним запросом вместо запроса на каждую таблицу
+            logger.info(f"Создание {len(create_table_commands)} таблиц...")
+            try:
+                await db.execute_script(';\n'.join(create_table_commands))
+                logger.info("✓ Таблицы созданы")
+                create_table_commands = []
+            except Exception as e:
+                logger.warning(f"Не удалось создать таблицы одним запросом ({e}), создаем по одной...")
+            
+            for command in create_table_commands:
+                if command:
+                    # Извлекаем имя таблицы из команды
+                    table_name = command.split('(')[0].split()[-1] if '(' in command else "unknown"
+                    try:
+                        await cursor.execute(command)
+                        logger.info(f"✓ Таблица создана: {table_name}")
+                    except Exception as e:
+                        if _mysql_errno(e) in _SCHEMA_EXISTS_ERRNOS:
+                            logger.info(f"Таблица уже существует: {table_name}")
+                        else:
+                            logger.error(f"Ошибка при создании таблицы: {e}")
+                            logger.error(f"   Команда: {command[:100]}")
+            
+            # Затем создаем индексы. MariaDB понимает CREATE INDEX IF NOT EXISTS,
+            # и все индексы создаются одним запросом; MySQL такой синтаксис не
+            # поддерживает - тогда создаем по одному, пропуская существующие
+            logger.info(f"Создание {len(create_index_commands)} индексов...")
+            try:
+                await db.execute_script(';\n'.join(create_index_commands))
+                logger.debug("✓ Индексы созданы одним запросом")
+                create_index_commands = []
+            except Exception as e:
+                logger.debug("Не удалось создать индексы одним запросом (%s), создаем по одному...", e)
+            
+            for command in create_index_commands:
+                if command:
+                    # Извлекаем имя индекса из команды
+                    index_name = command.split('ON')[0].split()[-1] if 'ON' in command else "unknown"
+                    try:
+                        await cursor.execute(command)
+                        logger.debug("✓ Индекс создан: %s", index_name)
+                    except Exception as e:
+                        errno = _mysql_errno(e)
+                        if errno in _SCHEMA_EXISTS_ERRNOS:
+                            logger.debug("Индекс уже существует: %s", index_name)
+                        elif errno == _NO_SUCH_TABLE_ERRNO:
+                            # Таблица не существует - это нормально, индекс будет создан позже
+                            logger.debug("Индекс пропущен (таблица не существует): %.50s...", command)
+                        else:
+                            logger.warning(f"⚠️ Ошибка при создании индекса: {e}")
+                            logger.warning(f"   Команда: {command[:100]}")
+            
+            await conn.commit()
+            
+            # Проверяем результат - все ли таблицы созданы
+            still_missing = await _find_missing_tables(cursor)
+            if still_missing:
+                logger.error(f"Не удалось создать таблицы: {', '.join(still_missing)}")
+                logger.warning("Примените схему вручную через MySQL:")
+                logger.warning(f"  mysql -u {db.config['user']} -p {db.config['db']} < database/schema.sql")
+            else:
+                logger.info("Схема базы данных успешно применена!")
+                logger.info("Все таблицы успешно созданы")
 
 
-@bot.event
 async def on_ready():
     """Событие при запуске бота"""
-    global db, rcon_manager, scheduler, startup_message_sent
+    global db, rcon_manager, scheduler, startup_message_sent, initialized
     
     if bot.user:
         logger.info(f'{bot.user} успешно запущен!')
         logger.info(f'Бот подключен к Discord как {bot.user.name}')
     logger.info(f'Бот подключен к {len(bot.guilds)} серверам')
     
+    if initialized:
+        logger.info("Переподключение к Discord, повторная инициализация не требуется")
+        return
+    initialized = True
+    
     try:
+        # RCON подключается в фоне, параллельно с инициализацией БД и проверкой схемы
+        logger.info("Инициализация RCON подключения...")
+        rcon_manager = RCONManager()
+        rcon_connect_task = asyncio.create_task(rcon_manager.connect())
+        
         # Инициализация базы данных
         logger.info("Инициализация базы данных...")
-        db = Database(DB_URL)
-        await db.connect()
+        try:
+            db = Database(DB_URL, minsize=DB_POOL_MINSIZE, maxsize=DB_POOL_MAXSIZE, pool_recycle=DB_POOL_RECYCLE)
+            await db.connect()
+        except BaseException:
+            # Без БД запуск прерывается - не оставляем подключение RCON в фоне.
+            # Ошибки самой задачи подавляем, чтобы дальше ушла ошибка БД
+            rcon_connect_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await rcon_connect_task
+            raise
         logger.info("✓ База данных подключена")
         
         # Проверка и автоматическое применение схемы БД
         try:
             if db.pool is not None:
-                logger.info("Проверка схемы базы данных...")
-                async with db.pool.acquire() as conn:
-                    async with conn.cursor() as cursor:
-                        # Список обязательных таблиц из schema.sql
-                        required_tables = [
-                            'users',
-                            'privileges',
-                            'warnings',
-                            'role_mappings',
-                            'admin_list_messages',
-                            'ticket_panels',
-                            'tickets'
-                        ]
-                        
-                        # Проверяем наличие каждой таблицы
-                        missing_tables = []
-                        for table_name in required_tables:
-                            await cursor.execute(
-                                "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = %s AND table_name = %s",
-                                (db.config['db'], table_name)
-                            )
-                            result = await cursor.fetchone()
-                            if not result or result[0] == 0:
-                                missing_tables.append(table_name)
-                        
-                        if missing_tables:
-                            logger.warning(f"⚠️ Найдены отсутствующие таблицы: {', '.join(missing_tables)}")
-                            logger.info("Применение схемы базы данных автоматически...")
-                            
-                            # Читаем схему из файла
-                            schema_file = Path(__file__).parent.parent / "database" / "schema.sql"
-                            if schema_file.exists():
-                                with open(schema_file, 'r', encoding='utf-8') as f:
-                                    schema_sql = f.read()
-                                
-                                # Убираем комментарии (строки начинающиеся с --)
-                                lines = []
-                                for line in schema_sql.split('\n'):
-                                    # Убираем комментарии в конце строки
-                                    comment_pos = line.find('--')
-                                    if comment_pos != -1:
-                                        line = line[:comment_pos]
-                                    lines.append(line)
-                                
-                                # Объединяем строки обратно
-                                cleaned_sql = '\n'.join(lines)
-                                
-                                # Разбиваем SQL на отдельные команды по точке с запятой
-                                commands = []
-                                current_command = []
-                                for line in cleaned_sql.split('\n'):
-                                    line = line.strip()
-                                    if not line:
-                                        continue
-                                    current_command.append(line)
-                                    if line.endswith(';'):
-                                        # Завершаем команду
-                                        command = ' '.join(current_command).rstrip(';').strip()
-                                        if command:
-                                            commands.append(command)
-                                        current_command = []
-                                
-                                # Если осталась незавершенная команда
-                                if current_command:
-                                    command = ' '.join(current_command).strip()
-                                    if command:
-                                        commands.append(command)
-                                
-                                # Разделяем команды на CREATE TABLE и CREATE INDEX
-                                create_table_commands = [cmd for cmd in commands if cmd.upper().startswith('CREATE TABLE')]
-                                create_index_commands = [cmd for cmd in commands if cmd.upper().startswith('CREATE INDEX')]
-                                
-                                logger.debug(f"Найдено {len(commands)} команд SQL: {len(create_table_commands)} таблиц, {len(create_index_commands)} индексов")
-                                
-                                # Сначала создаем таблицы
-                                logger.info(f"Создание {len(create_table_commands)} таблиц...")
-                                for command in create_table_commands:
-                                    if command:
-                                        try:
-                                            await cursor.execute(command)
-                                            # Извлекаем имя таблицы из команды
-                                            table_name = command.split('(')[0].split()[-1] if '(' in command else "unknown"
-                                            logger.info(f"✓ Таблица создана: {table_name}")
-                                        except Exception as e:
-                                            error_str = str(e).lower()
-                                            if "already exists" in error_str or "duplicate" in error_str:
-                                                table_name = command.split('(')[0].split()[-1] if '(' in command else "unknown"
-                                                logger.info(f"Таблица уже существует: {table_name}")
-                                            else:
-                                                logger.error(f"Ошибка при создании таблицы: {e}")
-                                                logger.error(f"   Команда: {command[:100]}")
-                                
-                                # Затем создаем индексы
-                                logger.info(f"Создание {len(create_index_commands)} индексов...")
-                                for command in create_index_commands:
-                                    if command:
-                                        try:
-                                            await cursor.execute(command)
-                                            # Извлекаем имя индекса из команды
-                                            index_name = command.split('ON')[0].split()[-1] if 'ON' in command else "unknown"
-                                            logger.debug(f"✓ Индекс создан: {index_name}")
-                                        except Exception as e:
-                                            error_str = str(e).lower()
-                                            if "already exists" in error_str or "duplicate" in error_str:
-                                                index_name = command.split('ON')[0].split()[-1] if 'ON' in command else "unknown"
-                                                logger.debug(f"Индекс уже существует: {index_name}")
-                                            elif "doesn't exist" in error_str:
-                                                # Таблица не существует - это нормально, индекс будет создан позже
-                                                logger.debug(f"Индекс пропущен (таблица не существует): {command[:50]}...")
-                                            else:
-                                                logger.warning(f"⚠️ Ошибка при создании индекса: {e}")
-                                                logger.warning(f"   Команда: {command[:100]}")
-                                
-                                await conn.commit()
-                                
-                                # Проверяем результат - все ли таблицы созданы
-                                still_missing = []
-                                for table_name in required_tables:
-                                    await cursor.execute(
-                                        "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = %s AND table_name = %s",
-                                        (db.config['db'], table_name)
-                                    )
-                                    result = await cursor.fetchone()
-                                    if not result or result[0] == 0:
-                                        still_missing.append(table_name)
-                                
-                                if still_missing:
-                                    logger.error(f"Не удалось создать таблицы: {', '.join(still_missing)}")
-                                    logger.warning("Примените схему вручную через MySQL:")
-                                    logger.warning(f"  mysql -u {db.config['user']} -p {db.config['db']} < database/schema.sql")
-                                else:
-                                    logger.info("Схема базы данных успешно применена!")
-                                    logger.info("Все таблицы успешно созданы")
-                            else:
-                                logger.error(f"Файл схемы не найден: {schema_file}")
-                                logger.warning("Примените схему вручную через MySQL:")
-                                logger.warning(f"  mysql -u {db.config['user']} -p {db.config['db']} < database/schema.sql")
-                        else:
-                            logger.info("Все таблицы базы данных существуют")
+                await _ensure_schema(db)
         except Exception as e:
             logger.warning(f"Не удалось проверить/применить схему БД: {e}")
         
-        # Инициализация RCON менеджера
-        logger.info("Инициализация RCON подключения...")
-        rcon_manager = RCONManager()
-        success = await rcon_manager.connect()
-        
-        # Установка статуса активности бота
-        activity_type_map = {
-            'watching': discord.ActivityType.watching,
-            'playing': discord.ActivityType.playing,
-            'streaming': discord.ActivityType.streaming,
-            'listening': discord.ActivityType.listening,
-            'competing': discord.ActivityType.competing
-        }
-        
-        activity_type = activity_type_map.get(BOT_ACTIVITY_TYPE, discord.ActivityType.watching)
+        # Дожидаемся подключения RCON, запущенного вместе с инициализацией БД
+        success = await rcon_connect_task
         
         if success:
             logger.info(f"✓ RCON подключен на порту {rcon_manager.connected_port}")
@@ -265,18 +340,16 @@ async def on_ready():
                                 return  # Пропускаем сообщение, если не содержит ключевых слов
                         
                         # Отправка в Discord канал (если настроен)
-                        channel_id = CHANNELS.get('CONSOLE_LOGS')
-                        if channel_id:
-                            for guild in bot.guilds:
-                                channel = guild.get_channel(channel_id)
-                                if isinstance(channel, discord.TextChannel):
-                                    # Обрезаем длинные сообщения (Discord лимит 2000 символов)
-                                    msg = message[:1950] if len(message) > 1950 else message
-                                    await channel.send(f"```\n{msg}\n```")
-                                    break
+                        if CONSOLE_LOG_CHANNEL_ID:
+                            # Поиск в общем кэше каналов бота, без перебора серверов
+                            channel = bot.get_channel(CONSOLE_LOG_CHANNEL_ID)
+                            if isinstance(channel, discord.TextChannel):
+                                # Обрезаем длинные сообщения (Discord лимит 2000 символов)
+                                msg = message[:1950] if len(message) > 1950 else message
+                                await channel.send(f"```\n{msg}\n```")
                         
                         # Логирование в файл
-                        logger.debug(f"Консоль: {message[:100]}")
+                        logger.debug("Консоль: %.100s", message)
                     except Exception as e:
                         logger.error(f"Ошибка обработки лога консоли: {e}")
                 
@@ -284,29 +357,26 @@ async def on_ready():
                 logger.info("✓ Прослушивание консоли включено")
             
             await bot.change_presence(
-                activity=discord.Activity(
-                    type=activity_type,
-                    name=BOT_ACTIVITY_NAME
-                ),
+                activity=BOT_ACTIVITY,
                 status=discord.Status.online
             )
         else:
             logger.error("✗ Не удалось подключиться к RCON серверу")
             await bot.change_presence(
                 status=discord.Status.idle,
-                activity=discord.Activity(
-                    type=activity_type,
-                    name=BOT_ACTIVITY_NAME
-                )
+                activity=BOT_ACTIVITY
             )
         
         # Загрузка команд
         logger.info("Загрузка команд...")
-        await setup_admin(bot, db)
-        await setup_privilege(bot, rcon_manager, db)
-        await setup_warn(bot, db, rcon_manager)
+        setups = [
+            setup_admin(bot, db),
+            setup_privilege(bot, rcon_manager, db),
+            setup_warn(bot, db, rcon_manager),
+        ]
         if db:
-            await setup_tickets(bot, db)
+            setups.append(setup_tickets(bot, db))
+        await asyncio.gather(*setups)
         logger.info("✓ Команды загружены")
         
         # Синхронизация команд с Discord
@@ -314,7 +384,7 @@ async def on_ready():
             logger.info("Синхронизация команд с Discord...")
             synced = await bot.tree.sync()
             logger.info(f"✓ Синхронизировано {len(synced)} команд с Discord")
-            if synced:
+            if synced and logger.isEnabledFor(logging.DEBUG):
                 logger.debug(f"Синхронизированные команды: {[cmd.name for cmd in synced]}")
         except Exception as e:
             logger.error(f"Ошибка синхронизации команд: {e}", exc_info=True)
@@ -338,7 +408,8 @@ async def on_ready():
                 log_receiver = LogReceiver(
                     bot=bot,
                     auth_token=ADMIN_LOG_API.get('AUTH_TOKEN', 'SECRET_TOKEN'),
-                    log_channel_id=ADMIN_LOG_API.get('LOG_CHANNEL_ID', 0) or None
+                    log_channel_id=ADMIN_LOG_API.get('LOG_CHANNEL_ID', 0) or None,
+                    min_category=ADMIN_LOG_API.get('MIN_CATEGORY', 'DEBUG')
                 )
                 await log_receiver.start(
                     host=ADMIN_LOG_API.get('HOST', '127.0.0.1'),
@@ -351,28 +422,25 @@ async def on_ready():
             logger.info("HTTP API для AdminLogCore отключен (ADMIN_LOG_API.ENABLED = false)")
         
         # Логирование в канал (если настроен) - только один раз
-        if CHANNELS.get('ADMIN_LOGS') and not startup_message_sent:
+        if ADMIN_LOG_CHANNEL_ID and not startup_message_sent:
             try:
-                channel_id = CHANNELS['ADMIN_LOGS']
-                # Ищем канал только в первом доступном сервере
-                for guild in bot.guilds:
-                    channel = guild.get_channel(channel_id)
-                    # Проверяем, что канал - это текстовый канал (TextChannel)
-                    if isinstance(channel, discord.TextChannel):
-                        await channel.send("Бот запущен и готов к работе")
-                        startup_message_sent = True
-                        break
+                channel = bot.get_channel(ADMIN_LOG_CHANNEL_ID)
+                # Проверяем, что канал - это текстовый канал (TextChannel)
+                if isinstance(channel, discord.TextChannel):
+                    await channel.send("Бот запущен и готов к работе")
+                    startup_message_sent = True
             except Exception as e:
                 logger.warning(f"Не удалось отправить сообщение в канал логов: {e}")
         
         logger.info("Бот полностью готов к работе!")
         
     except Exception as e:
+        # Разрешаем повторить инициализацию при следующем on_ready
+        initialized = False
         logger.error(f"Критическая ошибка при инициализации: {e}", exc_info=True)
         raise
 
 
-@bot.event
 async def on_member_update(before: discord.Member, after: discord.Member):
     """Обработка изменения участника (в т.ч. ролей)"""
     global admin_list_manager
@@ -383,12 +451,11 @@ async def on_member_update(before: discord.Member, after: discord.Member):
         if admin_list_manager and after.guild:
             try:
                 await admin_list_manager.update(after.guild)
-                logger.debug(f"Состав администрации обновлен после изменения ролей у {after.id}")
+                logger.debug("Состав администрации обновлен после изменения ролей у %s", after.id)
             except Exception as e:
                 logger.error(f"Ошибка обновления состава администрации: {e}", exc_info=True)
 
 
-@bot.event
 async def on_member_join(member: discord.Member):
     """Обработка присоединения участника"""
     global admin_list_manager
@@ -397,12 +464,11 @@ async def on_member_join(member: discord.Member):
     if admin_list_manager and member.guild:
         try:
             await admin_list_manager.update(member.guild)
-            logger.debug(f"Состав администрации обновлен после присоединения {member.id}")
+            logger.debug("Состав администрации обновлен после присоединения %s", member.id)
         except Exception as e:
             logger.error(f"Ошибка обновления состава администрации: {e}", exc_info=True)
 
 
-@bot.event
 async def on_member_remove(member: discord.Member):
     """Обработка выхода участника"""
     global admin_list_manager
@@ -411,44 +477,130 @@ async def on_member_remove(member: discord.Member):
     if admin_list_manager and member.guild:
         try:
             await admin_list_manager.update(member.guild)
-            logger.debug(f"Состав администрации обновлен после выхода {member.id}")
+            logger.debug("Состав администрации обновлен после выхода %s", member.id)
         except Exception as e:
             logger.error(f"Ошибка обновления состава администрации: {e}", exc_info=True)
 
 
-@bot.event
+async def _ignore_command_error(ctx, error):
+    """Ошибка не требует ответа (например, неизвестная команда)"""
+
+
+async def _send_missing_argument(ctx, error):
+    await ctx.send(f"Отсутствует обязательный аргумент: {error.param.name}")
+
+
+async def _send_bad_argument(ctx, error):
+    await ctx.send(f"Неверный аргумент: {error}")
+
+
 async def on_command_error(ctx, error):
     """Обработка ошибок команд"""
-    if isinstance(error, commands.CommandNotFound):
-        return
-    elif isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send(f"Отсутствует обязательный аргумент: {error.param.name}")
-    elif isinstance(error, commands.BadArgument):
-        await ctx.send(f"Неверный аргумент: {error}")
+    # Точное совпадение типа - один поиск в словаре; подклассы
+    # (например, MemberNotFound для BadArgument) ищем по иерархии
+    handler = COMMAND_ERROR_HANDLERS.get(type(error))
+    if handler is None:
+        handler = next(
+            (h for error_type, h in COMMAND_ERROR_HANDLERS.items() if isinstance(error, error_type)),
+            None
+        )
+    
+    if handler is not None:
+        await handler(ctx, error)
     else:
         logger.error(f"Ошибка в команде {ctx.command}: {error}", exc_info=True)
         await ctx.send(f"Произошла ошибка при выполнении команды: {error}")
 
 
+async def _close_concurrently(*coros):
+    """Выполнить закрытие ресурсов параллельно; ошибка одного не мешает остальным"""
+    results = await asyncio.gather(*coros, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"Ошибка при завершении работы: {result}", exc_info=result)
+
+
 async def cleanup():
     """Очистка ресурсов при завершении"""
     global db, rcon_manager, scheduler, log_receiver
     
     logger.info("Завершение работы бота...")
     
-    if log_receiver:
-        await log_receiver.stop()
+    # Сначала останавливаем источники новой работы (HTTP API и планировщик),
+    # затем параллельно закрываем соединения, которыми они пользуются
+    await _close_concurrently(
+        *([log_receiver.stop()] if log_receiver else []),
+        *([scheduler.stop()] if scheduler else []),
+    )
+    await _close_concurrently(
+        *([rcon_manager.close()] if rcon_manager else []),
+        *([db.close()] if db else []),
+    )
+    
+    logger.info("Бот завершил работу")
+
+
+async def _amain():
+    """Работа бота и освобождение ресурсов в одном цикле событий"""
+    async with bot:
+        try:
+            await bot.start(DISCORD_TOKEN)
+        finally:
+            # Ресурсы закрываются до закрытия бота: HTTP API еще может
+            # дописать накопленные логи в Discord
+            await cleanup()
+
+
+def _build_bot() -> commands.Bot:
+    """
+    Импортировать discord.py и модули бота и создать экземпляр бота
+    Вызывается из main() только после проверки конфигурации
+    """
+    global discord, commands, Database, RCONManager, PrivilegeScheduler, AdminListManager, LogReceiver
+    global setup_admin, setup_privilege, setup_warn, setup_tickets
+    global bot, ACTIVITY_TYPES, BOT_ACTIVITY_TYPE_VALUE, BOT_ACTIVITY, COMMAND_ERROR_HANDLERS
+    
+    import discord
+    from discord.ext import commands
     
-    if scheduler:
-        await scheduler.stop()
+    from src.database.models import Database
+    from src.rcon.rcon_manager import RCONManager
+    from src.commands import setup_admin, setup_privilege, setup_warn, setup_tickets
+    from src.tasks.scheduler import PrivilegeScheduler
+    from src.utils.admin_list_manager import AdminListManager
+    from src.api.log_receiver import LogReceiver
     
-    if rcon_manager:
-        await rcon_manager.close()
+    # Тип активности бота вычисляется один раз из конфигурации
+    ACTIVITY_TYPES = {
+        'watching': discord.ActivityType.watching,
+        'playing': discord.ActivityType.playing,
+        'streaming': discord.ActivityType.streaming,
+        'listening': discord.ActivityType.listening,
+        'competing': discord.ActivityType.competing
+    }
+    BOT_ACTIVITY_TYPE_VALUE = ACTIVITY_TYPES.get(BOT_ACTIVITY_TYPE, discord.ActivityType.watching)
+    # Активность не зависит от состояния RCON - создается один раз и
+    # переиспользуется при каждом on_ready (в том числе после переподключений)
+    BOT_ACTIVITY = discord.Activity(type=BOT_ACTIVITY_TYPE_VALUE, name=BOT_ACTIVITY_NAME)
     
-    if db:
-        await db.close()
+    # Обработчики ожидаемых ошибок команд (порядок важен для поиска по иерархии)
+    COMMAND_ERROR_HANDLERS = {
+        commands.CommandNotFound: _ignore_command_error,
+        commands.MissingRequiredArgument: _send_missing_argument,
+        commands.BadArgument: _send_bad_argument,
+    }
     
-    logger.info("Бот завершил работу")
+    # Создание бота с необходимыми intents
+    intents = discord.Intents.default()
+    intents.message_content = True
+    intents.members = True
+    intents.guilds = True
+    
+    bot = commands.Bot(command_prefix='!', intents=intents)
+    for handler in (on_ready, on_member_update, on_member_join, on_member_remove, on_command_error):
+        bot.event(handler)
+    
+    return bot
 
 
 def main():
@@ -469,31 +621,26 @@ def main():
         logger.error("=" * 60)
         return
     
+    _build_bot()
+    
+    # uvloop (libuv) заметно дешевле стандартного цикла событий; на Windows недоступен
+    if sys.platform != 'win32':
+        try:
+            import uvloop
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+            logger.info("Используется цикл событий uvloop")
+        except ImportError:
+            logger.debug("uvloop не установлен, используется стандартный цикл событий")
+    
     try:
-        bot.run(DISCORD_TOKEN)
+        asyncio.run(_amain())
     except KeyboardInterrupt:
         logger.info("Получен сигнал прерывания")
     except Exception as e:
         logger.error(f"Критическая ошибка: {e}", exc_info=True)
     finally:
-        # Пытаемся выполнить cleanup, но если event loop уже закрыт - игнорируем ошибку
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_closed():
-                # Event loop уже закрыт, создаем новый
-                asyncio.run(cleanup())
-            else:
-                # Event loop еще открыт, используем его
-                loop.run_until_complete(cleanup())
-        except RuntimeError:
-            # Нет активного event loop, создаем новый
-            try:
-                asyncio.run(cleanup())
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    logger.warning("Event loop уже закрыт, пропускаем cleanup")
-                else:
-                    raise
+        # Последним шагом дописываем очередь логов (после сообщений выше)
+        _stop_log_listener()
 
 
 if __name__ == "__main__":
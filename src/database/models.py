@@ -2,9 +2,11 @@
 Модели базы данных
 Поддержка MariaDB/MySQL
 """
+import asyncio
 from datetime import datetime
 from typing import Optional, List, Dict
 import aiomysql
+from pymysql.constants import CLIENT
 import logging
 from urllib.parse import urlparse, unquote
 
@@ -14,9 +16,21 @@ logger = logging.getLogger(__name__)
 class Database:
     """Класс для работы с базой данных (MariaDB/MySQL)"""
     
-    def __init__(self, db_url: str):
+    # Интервал фоновой проверки соединения пула (в секундах)
+    HEALTH_CHECK_INTERVAL = 60
+    
+    def __init__(self, db_url: str, minsize: int = 1, maxsize: int = 10, pool_recycle: int = 1800):
         self.db_url = db_url
         self.pool: Optional[aiomysql.Pool] = None
+        self._health_check_task: Optional[asyncio.Task] = None
+        
+        # Параметры пула соединений; pool_recycle пересоздает соединения
+        # раньше, чем сервер закроет их по wait_timeout
+        self.pool_options = {
+            'minsize': minsize,
+            'maxsize': max(minsize, maxsize),
+            'pool_recycle': pool_recycle,
+        }
         
         # Парсим URL для подключения
         parsed = urlparse(db_url)
@@ -40,7 +54,8 @@ class Database:
         """Подключение к базе данных"""
         try:
             logger.info(f"Попытка подключения к БД: {self.config['host']}:{self.config['port']}, пользователь: {self.config['user']}, БД: {self.config['db']}")
-            self.pool = await aiomysql.create_pool(**self.config, minsize=1, maxsize=10)
+            self.pool = await aiomysql.create_pool(**self.config, **self.pool_options)
+            self._health_check_task = asyncio.create_task(self._health_check_loop())
             logger.info("✓ Подключение к базе данных установлено")
         except aiomysql.OperationalError as e:
             error_code, error_msg = e.args
@@ -66,6 +81,10 @@ class Database:
     
     async def close(self):
         """Закрытие соединения с базой данных"""
+        if self._health_check_task:
+            self._health_check_task.cancel()
+            self._health_check_task = None
+        
         if self.pool:
             try:
                 self.pool.close()
@@ -78,6 +97,34 @@ class Database:
                 else:
                     raise
     
+    async def _health_check_loop(self):
+        """Периодически проверять соединение из пула, чтобы оборванные заменялись заранее"""
+        while True:
+            await asyncio.sleep(self.HEALTH_CHECK_INTERVAL)
+            try:
+                async with self.pool.acquire() as conn:
+                    async with conn.cursor() as cursor:
+                        await cursor.execute("SELECT 1")
+            except Exception as e:
+                logger.warning(f"Проверка соединения с БД не прошла: {e}")
+    
+    async def execute_script(self, sql: str):
+        """
+        Выполнить несколько SQL команд, разделенных ';', одним запросом
+        Для этого открывается отдельное соединение с MULTI_STATEMENTS,
+        чтобы не включать этот режим для всего пула
+        """
+        conn = await aiomysql.connect(**self.config, client_flag=CLIENT.MULTI_STATEMENTS)
+        try:
+            async with conn.cursor() as cursor:
+                await cursor.execute(sql)
+                # Результаты всех команд нужно дочитать, иначе ошибка в них не всплывет
+                while await cursor.nextset():
+                    pass
+            await conn.commit()
+        finally:
+            conn.close()
+    
     # Users
     async def get_user_by_discord(self, discord_id: int) -> Optional[dict]:
         """Получить пользователя по Discord ID"""
@@ -4,9 +4,12 @@
 """
 import asyncio
 import logging
+import statistics
+import time
+from collections import deque
 from typing import Optional
 
-from config.config import RCON_HOST, RCON_PORT, RCON_PASS
+from config.config import RCON_HOST, RCON_PORT, RCON_PASS, RCON_TLS
 from src.rcon.webrcon_client import WebRCONClient
 
 logger = logging.getLogger(__name__)
@@ -21,30 +24,78 @@ class RCONManager:
         self.port = RCON_PORT
         self.password = RCON_PASS
         self.connected_port: Optional[int] = None
+        
+        # Экспоненциальная задержка между неудачными попытками подключения
+        self._connect_failures = 0
+        self._next_connect_attempt = 0.0
+        # Длительности успешных подключений для адаптивного таймаута
+        self._connect_durations: deque = deque(maxlen=64)
+        # Не даем параллельным командам одновременно переподключаться
+        self._connect_lock = asyncio.Lock()
+    
+    def _connect_timeout(self) -> float:
+        """Таймаут попытки подключения: удвоенный 99-й перцентиль успешных подключений"""
+        if len(self._connect_durations) < 2:
+            return 3.0
+        p99 = statistics.quantiles(self._connect_durations, n=100)[98]
+        return min(10.0, max(1.0, p99 * 2))
     
     async def connect(self) -> bool:
         """Подключение к RCON серверу"""
-        # Закрываем предыдущее подключение если есть
+        # Клиент создается один раз и переиспользуется при переподключениях,
+        # чтобы сохранить callback консоли и счетчик идентификаторов
         if self.client:
             await self.client.close()
-            self.client = None
-        
-        logger.info(f"Попытка подключения к RCON серверу через WebRCON (WebSocket)...")
+        else:
+            self.client = WebRCONClient(self.host, self.port, self.password, try_ports=True, use_tls=RCON_TLS)
+        self.client.connect_timeout = self._connect_timeout()
         
-        self.client = WebRCONClient(self.host, self.port, self.password, try_ports=True)
+        logger.info("Попытка подключения к RCON серверу через WebRCON (WebSocket)...")
         
+        started = time.monotonic()
         success = await self.client.connect(test_command="version")
         
         if success:
+            self._connect_durations.append(time.monotonic() - started)
+            self._connect_failures = 0
+            self._next_connect_attempt = 0.0
             self.connected_port = self.client.connected_port
             logger.info(f"✓ Успешное подключение к WebRCON на порту {self.connected_port}!")
         else:
+            self._connect_failures += 1
+            delay = min(60, 2 ** self._connect_failures)
+            self._next_connect_attempt = time.monotonic() + delay
             logger.error("✗ Не удалось подключиться к WebRCON серверу")
             logger.error("Убедитесь, что в Startup Command установлено: +rcon.web true")
-            self.client = None
+            logger.info(f"Следующая попытка подключения не раньше чем через {delay} сек.")
+            self.connected_port = None
         
         return success
     
+    async def _get_client(self) -> Optional[WebRCONClient]:
+        """
+        Получение подключенного клиента
+        
+        Подключение выполняется только если текущее соединение закрыто
+        и не действует задержка после неудачной попытки.
+        
+        Returns:
+            Подключенный клиент или None
+        """
+        async with self._connect_lock:
+            if self.client is not None and self.client.is_alive():
+                return self.client
+            
+            if time.monotonic() < self._next_connect_attempt:
+                logger.debug("WebRCON недоступен, ожидание следующей попытки подключения")
+                return None
+            
+            logger.debug("WebRCON клиент не подключен, пытаемся подключиться...")
+            if not await self.connect():
+                logger.error("Не удалось подключиться к WebRCON серверу")
+                return None
+            return self.client
+    
     async def send_command(self, command: str, timeout: float = 10.0) -> Optional[str]:
         """
         Отправка команды на RCON сервер с автоматическим переподключением
@@ -56,30 +107,24 @@ class RCONManager:
         Returns:
             Ответ сервера или None при ошибке
         """
-        # Проверяем наличие подключения
-        if self.client is None or self.client.websocket is None:
-            logger.debug("WebRCON клиент не подключен, пытаемся подключиться...")
-            success = await self.connect()
-            if not success:
-                logger.error("Не удалось подключиться к WebRCON серверу")
-                return None
-        
-        if self.client is None:
-            logger.error("WebRCON клиент все еще не подключен")
+        client = await self._get_client()
+        if client is None:
             return None
         
         # Отправка команды
-        logger.debug(f"Отправка команды '{command}' на WebRCON сервер")
-        response = await self.client.send_command(command, timeout=timeout)
+        logger.debug("Отправка команды '%s' на WebRCON сервер", command)
+        response = await client.send_command(command, timeout=timeout)
         
         if response:
-            logger.debug(f"Получен ответ на команду '{command}': {len(response)} символов")
+            logger.debug("Получен ответ на команду '%s': %s символов", command, len(response))
+        elif not client.is_alive():
+            # Соединение оборвалось во время команды - переподключаемся и повторяем один раз
+            logger.warning(f"Соединение потеряно во время команды '{command}', пробуем переподключиться...")
+            client = await self._get_client()
+            if client is not None:
+                response = await client.send_command(command, timeout=timeout)
         else:
-            logger.warning(f"Команда '{command}' не вернула ответ, пробуем переподключиться...")
-            # Пробуем переподключиться и повторить команду один раз
-            success = await self.connect()
-            if success:
-                response = await self.client.send_command(command, timeout=timeout)
+            logger.warning(f"Команда '{command}' не вернула ответ")
         
         return response
     
@@ -92,7 +137,7 @@ class RCONManager:
     
     def is_connected(self) -> bool:
         """Проверка, подключен ли клиент"""
-        return self.client is not None and self.client.websocket is not None
+        return self.client is not None and self.client.is_alive()
     
     def set_console_callback(self, callback):
         """
@@ -1,30 +1,122 @@
 """
-WebRCON клиент для Rust сервера через WebSocket
-Перенесено и адаптировано из legacy/bot.py с поддержкой нескольких портов
+WebRCON клиент для Rust сервера через WebSocket с поддержкой нескольких портов
 """
 import asyncio
+import inspect
+import itertools
 import json
 import logging
-from typing import Optional, List, Callable, Awaitable
+import socket
+import sys
+import time
+from json.encoder import encode_basestring_ascii
+from typing import Optional, List, Dict, Tuple, Callable, Awaitable
 
 import websockets
 
+# asyncio.timeout не создает промежуточную задачу, в отличие от asyncio.wait_for
+if sys.version_info >= (3, 11):
+    _timeout = asyncio.timeout
+else:  # async_timeout ставится вместе с aiohttp на Python < 3.11
+    from async_timeout import timeout as _timeout
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # orjson необязателен, используем стандартный json
+    _json_loads = json.loads
+
 logger = logging.getLogger(__name__)
 
+# Параметры websockets.connect; имя аргумента для заголовков зависит от версии библиотеки
+_CONNECT_PARAMS = inspect.signature(websockets.connect).parameters
+# Встроенный ping/pong выявляет оборванные соединения; сжатие для коротких
+# текстовых сообщений RCON не нужно
+_CONNECT_KWARGS = {
+    "ping_interval": 20,
+    "ping_timeout": 20,
+    "compression": None,
+    # Ответы status на заполненном сервере или find могут быть большими;
+    # сообщение сверх лимита закрывает соединение с кодом 1009, поэтому
+    # оставляем стандартный для websockets 1 МБ
+    "max_size": 2 ** 20,
+    "read_limit": 65536,
+    "write_limit": 65536,
+    "close_timeout": 5.0,
+}
+for _headers_key in ("additional_headers", "extra_headers"):
+    if _headers_key in _CONNECT_PARAMS:
+        _CONNECT_KWARGS[_headers_key] = {"User-Agent": "WebRcon"}
+        break
+
+# Кэш разрешенных адресов хостов: host -> (момент истечения, адреса)
+_RESOLVED_HOSTS: Dict[str, Tuple[float, Tuple[str, ...]]] = {}
+_RESOLVE_TTL = 300.0
+
+
+async def _resolve_host(host: str) -> Tuple[str, ...]:
+    """
+    Разрешение имени хоста в IP адреса с кэшированием на _RESOLVE_TTL секунд
+    
+    IPv4 адреса идут первыми: localhost часто разрешается сначала в ::1,
+    а Rust WebRCON обычно слушает только IPv4.
+    
+    Args:
+        host: Имя хоста или IP адрес
+        
+    Returns:
+        IP адреса в порядке попыток подключения
+        
+    Raises:
+        socket.gaierror: Если имя хоста не удалось разрешить
+    """
+    now = time.monotonic()
+    cached = _RESOLVED_HOSTS.get(host)
+    if cached and cached[0] > now:
+        return cached[1]
+    
+    infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+    addresses = []
+    for family, _, _, _, sockaddr in sorted(infos, key=lambda info: info[0] != socket.AF_INET):
+        # IPv6 адрес в URI указывается в скобках
+        address = f"[{sockaddr[0]}]" if family == socket.AF_INET6 else sockaddr[0]
+        if address not in addresses:
+            addresses.append(address)
+    addresses = tuple(addresses)
+    _RESOLVED_HOSTS[host] = (now + _RESOLVE_TTL, addresses)
+    return addresses
+
 
 class WebRCONClient:
     """
     WebRCON клиент для Rust сервера через WebSocket
     Поддерживает автоматическое подключение к нескольким портам
     """
-    def __init__(self, host: str, port: int, password: str, try_ports: bool = True):
+    # Неизменяемый хвост JSON-сообщения команды
+    _NAME_SUFFIX = ',"Name":"WebRcon"}'
+    
+    def __init__(self, host: str, port: int, password: str, try_ports: bool = True,
+                 connect_timeout: float = 3.0, use_tls: bool = False):
         self.host = host
         self.port = port
         self.password = password
+        # Пароль передается в пути URI как есть: WebRCON сравнивает путь
+        # запроса с rcon.password без декодирования
+        self._password_path = f"/{password}"
+        self.connect_timeout = connect_timeout
+        self.use_tls = use_tls
         self.websocket = None
-        self.identifier = 0
+        # Идентификаторы команд в диапазоне int32 (как в Rust WebRCON), без нуля
+        self._ids = itertools.count()
         self.uri = None
         self.connected_port = None
+        # Последние успешно проверенные порт и номер варианта URI - при переподключении
+        # пробуются первыми; адрес разрешается заново, чтобы учитывался TTL кэша DNS
+        self._last_good: Optional[tuple[int, int]] = None
+        self._last_good_refusals = 0
+        # Текущее соединение подтверждено ответом сервера; после быстрого
+        # переподключения это становится известно только с первым ответом
+        self._verified = False
         
         # Прослушивание консоли
         self._console_listener_task: Optional[asyncio.Task] = None
@@ -36,93 +128,253 @@ class WebRCONClient:
         
         # Список портов для попыток подключения (если try_ports=True)
         if try_ports:
-            self.ports_to_try = [port, port - 2, port + 2, port - 10, port + 10]
-            self.ports_to_try = [p for p in self.ports_to_try if 0 < p < 65536]
-            self.ports_to_try = list(dict.fromkeys(self.ports_to_try))  # Удаляем дубликаты
+            # Один проход: отбрасываем недопустимые порты и дубликаты, сохраняя порядок
+            seen = set()
+            self.ports_to_try = tuple(
+                p for p in (port, port - 2, port + 2, port - 10, port + 10)
+                if 0 < p < 65536 and not (p in seen or seen.add(p))
+            )
         else:
-            self.ports_to_try = [port]
+            self.ports_to_try = (port,)
         
     async def connect(self, test_command: str = "version") -> bool:
         """
         Подключение к WebRCON серверу с автоматическим перебором портов
         
+        Все комбинации порт/URI пробуются одновременно, используется первое
+        соединение, прошедшее проверку; остальные попытки отменяются.
+        Переподключение по последнему рабочему URI проверкой не сопровождается:
+        если сервер закроет такое соединение до первого ответа, последний
+        рабочий вариант сбрасывается и следующее подключение выполнит полный
+        перебор с проверкой.
+        
         Args:
-            test_command: Команда для проверки подключения после установки соединения
+            test_command: Команда для проверки подключения при полном переборе
             
         Returns:
             True если подключение успешно установлено и проверено
         """
-        # Пробуем подключиться на разных портах
-        for port in self.ports_to_try:
-            if await self._connect_to_port(port, test_command):
-                self.connected_port = port
-                return True
+        # Сначала пробуем последний рабочий вариант, полный перебор - только при неудаче.
+        # Этот URI уже проверялся командой, поэтому достаточно успешного рукопожатия
+        if self._last_good and await self._reconnect_last_good():
+            return True
         
-        logger.error(f"Не удалось подключиться к WebRCON на хосте {self.host} ни на одном из портов: {self.ports_to_try}")
-        return False
+        # Разрешаем имя один раз, чтобы не делать DNS запрос на каждую попытку.
+        # Ошибка DNS фатальна для всего хоста - порты и URI перебирать бессмысленно
+        try:
+            addresses = await _resolve_host(self.host)
+        except socket.gaierror as e:
+            logger.error(f"Не удалось разрешить адрес WebRCON хоста {self.host}: {e}")
+            return False
+        
+        # Адреса пробуем по очереди, как это делает сам websockets.connect
+        connected = False
+        for address in addresses:
+            if await self._probe_address(address, test_command):
+                connected = True
+                break
+        
+        if not connected:
+            logger.error(f"Не удалось подключиться к WebRCON на хосте {self.host} ни на одном из портов: {self.ports_to_try}")
+        return connected
     
-    async def _connect_to_port(self, port: int, test_command: Optional[str] = None) -> bool:
+    async def _probe_address(self, address: str, test_command: str) -> bool:
         """
-        Попытка подключения к конкретному порту
+        Одновременный перебор портов и вариантов URI на одном адресе
         
         Args:
-            port: Порт для подключения
+            address: Разрешенный IP адрес хоста
             test_command: Команда для проверки подключения
             
         Returns:
-            True если подключение успешно и проверено
+            True если подключение установлено и проверено
         """
-        uri_variants = [
-            f"ws://{self.host}:{port}/{self.password}",
-            f"ws://{self.host}:{port}/",
-            f"ws://{self.host}:{port}",
-            f"wss://{self.host}:{port}/{self.password}",
-        ]
+        tasks = {}
+        for port in self.ports_to_try:
+            for variant, uri in enumerate(self._build_uri_variants(address, port)):
+                tasks[asyncio.create_task(self._open_websocket(uri))] = (port, variant, uri)
         
-        for uri in uri_variants:
-            try:
-                logger.debug(f"Попытка подключения к WebRCON: {uri}")
-                try:
-                    self.websocket = await asyncio.wait_for(
-                        websockets.connect(uri, ping_interval=None, extra_headers={
-                            "User-Agent": "WebRcon"
-                        }),
-                        timeout=10.0
-                    )
-                except TypeError:
-                    self.websocket = await asyncio.wait_for(
-                        websockets.connect(uri, ping_interval=None),
-                        timeout=10.0
-                    )
-                
-                logger.info(f"WebSocket подключен к {self.host}:{port} (URI: {uri})")
-                self.uri = uri
-                
-                # Автоматически запускаем listener после подключения
-                await self.start_console_listener()
-                
-                # Проверяем подключение командой
-                if test_command:
-                    response = await self.send_command(test_command, timeout=5.0)
-                    if response:
-                        logger.info(f"✓ Подключение проверено, ответ на '{test_command}': {response[:100]}")
-                        return True
-                    else:
-                        logger.warning(f"WebSocket подключен, но команда '{test_command}' не вернула ответ")
-                        await self.close()
+        pending = set(tasks)
+        connected = False
+        try:
+            while pending and not connected:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled():
                         continue
-                
-                return True
-                
-            except asyncio.TimeoutError:
-                logger.warning(f"Таймаут при подключении к {uri}")
+                    port, variant, uri = tasks[task]
+                    try:
+                        websocket = task.result()
+                    except asyncio.TimeoutError:
+                        logger.warning(f"Таймаут при подключении к {uri}")
+                        continue
+                    except ConnectionRefusedError:
+                        # Отказ в соединении относится ко всему порту, остальные URI
+                        # этого порта тоже не подключатся
+                        logger.debug("Порт %s отклонил соединение", port)
+                        for other in pending:
+                            if tasks[other][0] == port:
+                                other.cancel()
+                        continue
+                    except Exception as e:
+                        logger.debug("Ошибка подключения к %s: %s", uri, e)
+                        continue
+                    
+                    if connected:
+                        # Соединение уже выбрано, лишние сокеты закрываем
+                        await websocket.close()
+                    elif await self._use_websocket(websocket, port, uri, test_command):
+                        self.connected_port = port
+                        self._last_good = (port, variant)
+                        self._last_good_refusals = 0
+                        self._verified = True
+                        connected = True
+        finally:
+            # Отменяем оставшиеся попытки и закрываем успевшие открыться сокеты
+            for task in pending:
+                task.cancel()
+            for result in await asyncio.gather(*pending, return_exceptions=True):
+                if not isinstance(result, BaseException):
+                    await result.close()
+        
+        return connected
+    
+    async def _reconnect_last_good(self) -> bool:
+        """
+        Переподключение по последнему успешному порту и варианту URI
+        
+        Returns:
+            True если рукопожатие прошло успешно
+        """
+        port, variant = self._last_good
+        try:
+            addresses = await _resolve_host(self.host)
+        except socket.gaierror as e:
+            logger.debug("Не удалось разрешить адрес WebRCON хоста %s: %s", self.host, e)
+            return False
+        
+        websocket = None
+        refused = True
+        for address in addresses:
+            uri = self._build_uri_variants(address, port)[variant]
+            try:
+                websocket = await self._open_websocket(uri)
+                break
+            except ConnectionRefusedError:
                 continue
             except Exception as e:
-                error_msg = str(e)
-                logger.debug(f"Ошибка подключения к {uri}: {error_msg}")
-                continue
+                logger.debug("Последний рабочий URI %s недоступен: %s", uri, e)
+                refused = False
+        
+        if websocket is None:
+            if refused:
+                # Повторный отказ означает, что сервер переехал на другой порт
+                self._last_good_refusals += 1
+                if self._last_good_refusals > 1:
+                    logger.debug("Последний рабочий порт %s сброшен после повторных отказов", port)
+                    self._last_good = None
+            return False
+        
+        await self._use_websocket(websocket, port, uri)
+        self.connected_port = port
+        self._last_good_refusals = 0
+        self._verified = False
+        return True
+    
+    def _forget_unverified_last_good(self):
+        """
+        Сброс последнего рабочего варианта, если соединение по нему закрылось
+        до первого ответа (например, после смены пароля RCON)
+        """
+        if not self._verified and self._last_good is not None:
+            logger.warning("Соединение WebRCON закрыто до первого ответа, следующее подключение выполнит полную проверку")
+            self._last_good = None
+    
+    def _build_uri_variants(self, address: str, port: int) -> List[str]:
+        """
+        Варианты URI для подключения к порту
+        
+        Args:
+            address: Разрешенный IP адрес хоста
+            port: Порт для подключения
+        """
+        uri_variants = [
+            f"ws://{address}:{port}{self._password_path}",
+            f"ws://{address}:{port}/",
+            f"ws://{address}:{port}",
+        ]
+        # wss:// пробуем только если включен TLS: на обычном ws:// порту
+        # такая попытка всегда заканчивается таймаутом
+        if self.use_tls:
+            # Для TLS нужно имя хоста, иначе не пройдет проверка сертификата
+            uri_variants.append(f"wss://{self.host}:{port}{self._password_path}")
+        return uri_variants
+    
+    async def _open_websocket(self, uri: str):
+        """
+        Открытие WebSocket соединения без проверки
+        
+        Args:
+            uri: URI для подключения
+            
+        Returns:
+            Открытое WebSocket соединение
+        """
+        logger.debug("Попытка подключения к WebRCON: %s", uri)
+        # Таймаут рукопожатия отдаем самой библиотеке: она корректно закрывает
+        # сокет, если время вышло посреди рукопожатия
+        return await websockets.connect(uri, open_timeout=self.connect_timeout, **_CONNECT_KWARGS)
+    
+    async def _use_websocket(self, websocket, port: int, uri: str, test_command: Optional[str] = None) -> bool:
+        """
+        Использование открытого соединения и его проверка
+        
+        Args:
+            websocket: Открытое WebSocket соединение
+            port: Порт соединения
+            uri: URI соединения
+            test_command: Команда для проверки подключения
+            
+        Returns:
+            True если подключение проверено
+        """
+        logger.info(f"WebSocket подключен к {self.host}:{port} (URI: {uri})")
+        self._tune_socket(websocket)
+        self.websocket = websocket
+        self.uri = uri
+        
+        # Автоматически запускаем listener после подключения
+        await self.start_console_listener()
+        
+        # Проверяем подключение командой
+        if test_command:
+            response = await self.send_command(test_command, timeout=5.0)
+            if response:
+                logger.info(f"✓ Подключение проверено, ответ на '{test_command}': {response[:100]}")
+                return True
+            logger.warning(f"WebSocket подключен, но команда '{test_command}' не вернула ответ")
+            await self.close()
+            return False
         
-        return False
+        return True
+    
+    @staticmethod
+    def _tune_socket(websocket):
+        """
+        Настройка TCP сокета под короткие сообщения RCON
+        
+        Отключаем алгоритм Нейгла явно: стандартный цикл asyncio делает это сам,
+        но не каждая реализация цикла событий это гарантирует. TCP keepalive
+        дополнительно к ping WebSocket выявляет обрыв на уровне ОС.
+        """
+        sock = websocket.transport.get_extra_info("socket")
+        if sock is None:
+            return
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        except OSError as e:
+            logger.debug("Не удалось настроить сокет WebRCON: %s", e)
     
     async def send_command(self, command: str, timeout: float = 10.0) -> Optional[str]:
         """
@@ -139,26 +391,24 @@ class WebRCONClient:
             return None
         
         try:
-            self.identifier += 1
-            cmd_id = self.identifier
-            message = {
-                "Identifier": cmd_id,
-                "Message": command,
-                "Name": "WebRcon"
-            }
+            cmd_id = next(self._ids) % 0x7FFFFFFF + 1
+            # Собираем JSON вручную: экранируется только текст команды
+            payload = '{"Identifier":' + str(cmd_id) + ',"Message":' + encode_basestring_ascii(command) + self._NAME_SUFFIX
             
             # Создаем Future для ожидания ответа
-            future = asyncio.Future()
+            future = asyncio.get_running_loop().create_future()
             self._pending_responses[cmd_id] = future
             
-            logger.debug(f"Отправка WebRCON команды: {json.dumps(message)}")
-            await self.websocket.send(json.dumps(message))
-            logger.debug(f"Команда отправлена (Identifier={cmd_id}), ожидание ответа...")
-            
             try:
+                logger.debug("Отправка WebRCON команды: %s", payload)
+                await self.websocket.send(payload)
+                logger.debug("Команда отправлена (Identifier=%s), ожидание ответа...", cmd_id)
+                
                 # Ждем ответ через Future (который заполнит listener)
-                response = await asyncio.wait_for(future, timeout=timeout)
-                logger.debug(f"Получен ответ на команду {cmd_id}: {len(str(response))} символов")
+                async with _timeout(timeout):
+                    response = await future
+                logger.debug("Получен ответ на команду %s: %s символов", cmd_id, len(str(response)))
+                self._verified = True
                 return response
             except asyncio.TimeoutError:
                 logger.error(f"Таймаут при ожидании ответа WebRCON (Identifier={cmd_id})")
@@ -171,8 +421,14 @@ class WebRCONClient:
                 
         except Exception as e:
             logger.error(f"Ошибка при отправке команды WebRCON: {e}")
+            if not self.is_alive():
+                self._forget_unverified_last_good()
             return None
     
+    def is_alive(self) -> bool:
+        """Проверка состояния соединения без обращения к серверу"""
+        return self.websocket is not None and not self.websocket.closed
+    
     def set_console_callback(self, callback: Optional[Callable[[str], Awaitable[None]]]):
         """
         Установка callback для обработки сообщений консоли
@@ -211,17 +467,15 @@ class WebRCONClient:
         
         while self._listening and self.websocket:
             try:
-                # Получаем сообщение с таймаутом
-                try:
-                    response_text = await asyncio.wait_for(
-                        self.websocket.recv(),
-                        timeout=1.0
-                    )
-                except asyncio.TimeoutError:
-                    continue  # Просто продолжаем слушать
+                # Ждем следующее сообщение; остановка происходит через отмену задачи
+                response_text = await self.websocket.recv()
+                
+                # Если некому передать сообщение, не тратим время на разбор JSON
+                if not self._pending_responses and self._console_callback is None:
+                    continue
                 
                 try:
-                    response = json.loads(response_text)
+                    response = _json_loads(response_text)
                     msg_type = response.get("Type")
                     identifier = response.get("Identifier")
                     message = response.get("Message", "")
@@ -240,19 +494,21 @@ class WebRCONClient:
                         future = self._pending_responses.pop(identifier)
                         if not future.done():
                             future.set_result(message)
-                            logger.debug(f"Ответ на команду {identifier} передан в Future")
+                            logger.debug("Ответ на команду %s передан в Future", identifier)
                     
                 except json.JSONDecodeError as e:
-                    logger.debug(f"Ошибка парсинга JSON сообщения: {e}")
+                    logger.debug("Ошибка парсинга JSON сообщения: %s", e)
                 except Exception as e:
                     logger.error(f"Ошибка обработки сообщения консоли: {e}")
                     
-            except websockets.exceptions.ConnectionClosed:
+            except websockets.exceptions.ConnectionClosed as e:
                 logger.warning("WebSocket соединение закрыто, останавливаем прослушивание")
-                # Отменяем все ожидающие Future
+                self._listening = False
+                self._forget_unverified_last_good()
+                # Сразу завершаем ожидающие команды ошибкой, не дожидаясь их таймаутов
                 for future in self._pending_responses.values():
                     if not future.done():
-                        future.cancel()
+                        future.set_exception(ConnectionError(f"WebSocket соединение закрыто: {e}"))
                 self._pending_responses.clear()
                 break
             except Exception as e:
@@ -73,7 +73,8 @@ def parse_pinfo_response(response: str) -> Dict:
         year = int(match.group(5))
         time_str = match.group(6)
         
-        logger.debug(f"Найдена группа с датой: {group_name} until {day_of_week}, {day} {month_name} {year} {time_str} UTC")
+        logger.debug("Найдена группа с датой: %s until %s, %s %s %s %s UTC",
+                     group_name, day_of_week, day, month_name, year, time_str)
         
         # Парсим дату
         expires_at_utc = parse_utc_datetime(day_of_week, time_str, month_name, day, year)
@@ -84,7 +85,7 @@ def parse_pinfo_response(response: str) -> Dict:
                 'expires_at_utc': expires_at_utc,
                 'permanent': False
             })
-            logger.debug(f"Добавлена группа: {group_name}, expires_at_utc: {expires_at_utc}")
+            logger.debug("Добавлена группа: %s, expires_at_utc: %s", group_name, expires_at_utc)
         else:
             logger.warning(f"Не удалось распарсить дату для группы {group_name}")
     
@@ -113,7 +114,9 @@ def parse_pinfo_response(response: str) -> Dict:
                         'permanent': True
                     })
     
-    logger.debug(f"Парсинг pinfo завершен. Найдено групп: {len(groups)}, группы: {[g['name'] for g in groups]}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Парсинг pinfo завершен. Найдено групп: %s, группы: %s",
+                     len(groups), [g['name'] for g in groups])
     
     return {
         'has_privileges': len(groups) > 0,